@@ -0,0 +1,310 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Deque, Dict, List, Tuple
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+
+class Priority(IntEnum):
+    """
+    Admission priority classes, lower value is served first
+    """
+    READ = 0
+    WRITE = 1
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised when a request is shed by the Admission Controller
+    """
+    def __init__(self, reason: str, retry_after: int) -> None:
+        """
+        Raised when a request is shed by the Admission Controller
+
+        :param reason: Rejection reason ('queue_full' or 'deadline')
+        :param retry_after: Suggested retry delay [s]
+        """
+        super().__init__(reason, retry_after)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        return f'Request rejected by admission control: {self.reason}'
+
+
+class _Waiter:
+    """
+    Request waiting in the admission queue, ordered by priority class and arrival
+    """
+    def __init__(self, priority: Priority, order: int, deadline: float, service_time: float,
+                 slot: asyncio.Future) -> None:
+        self.priority = priority
+        self.order = order
+        self.deadline = deadline
+        self.service_time = service_time
+        self.slot = slot
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.order) < (other.priority, other.order)
+
+
+class AdmissionController:
+    """
+    Admission Controller with bounded concurrency, bounded priority queue and deadline-aware load shedding.\n
+    Requests that can not be started and finished before their deadline are rejected as soon as that is known,
+    based on their position in the queue and recent service times of their priority class.
+    Queued requests wait on the event loop, only admitted requests occupy a worker thread.
+    """
+    def __init__(self, max_concurrency: int, max_queue_size: int,
+                 service_time_window: float = 30.0, service_time_percentile: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Admission Controller
+
+        :param max_concurrency: Maximum number of concurrently executed requests
+        :param max_queue_size: Maximum number of requests waiting for admission
+        :param service_time_window: Service time samples older than the window are discarded [s]
+        :param service_time_percentile: Percentile of recent service times used as the service time estimate
+        :param clock: Monotonic clock the request deadlines are based on [s]
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.service_time_window = service_time_window
+        self.service_time_percentile = service_time_percentile
+        self.clock = clock
+
+        self._running = 0
+        self._running_service_time = 0.0  # sum of service time estimates of running requests
+        self._waiters: List[_Waiter] = []  # heap
+        self._arrival_counter = itertools.count()
+        # (completion time, service time per unit of cost) of each priority class
+        self._service_times: Dict[Priority, Deque[Tuple[float, float]]] = {
+            priority: deque(maxlen=100) for priority in Priority
+        }
+
+        # metrics
+        self._admitted = 0
+        self._completed = 0
+        self._shed = {'queue_full': 0, 'deadline': 0}
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._service_time_total = 0.0
+        self._service_time_max = 0.0
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority, deadline: float, cost: float = 1.0) -> AsyncIterator[None]:
+        """
+        Wait for admission and hold an execution slot for the duration of the context
+
+        :param priority: Request priority class
+        :param deadline: Request deadline (clock based) [s]
+        :param cost: Relative request cost, e.g. number of prompts in a batch request
+        :raises AdmissionRejectedError: If the request is shed
+        """
+        service_time_estimate = await self._acquire(priority, deadline, cost)
+        start_time = self.clock()
+        try:
+            yield
+        finally:
+            self._release(priority, cost, service_time_estimate, self.clock() - start_time)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get admission metrics, queue wait and service (run) time are measured separately
+
+        :return: Stats dictionary
+        """
+        now = self.clock()
+        stats = {'running': self._running,
+                 'queued': len(self._waiters),
+                 'admitted': self._admitted,
+                 'shed_queue_full': self._shed['queue_full'],
+                 'shed_deadline': self._shed['deadline'],
+                 'queue_wait_avg_s': self._queue_wait_total / self._admitted if self._admitted else 0.0,
+                 'queue_wait_max_s': self._queue_wait_max,
+                 'service_time_avg_s': self._service_time_total / self._completed if self._completed else 0.0,
+                 'service_time_max_s': self._service_time_max}
+        for priority in Priority:
+            stats[f'service_time_estimate_{priority.name.lower()}_s'] = self._estimate_service_time(priority, now)
+
+        return stats
+
+    async def _acquire(self, priority: Priority, deadline: float, cost: float) -> float:
+        """
+        Acquire execution slot, wait in queue if all slots are taken
+
+        :param priority: Request priority class
+        :param deadline: Request deadline (clock based) [s]
+        :param cost: Relative request cost
+        :return: Service time estimate of the request [s]
+        """
+        arrival_time = self.clock()
+        service_time = self._estimate_service_time(priority, arrival_time) * cost
+        is_idle = self._running == 0 and not self._waiters
+
+        # an idle controller always admits, so that a stale estimate is refreshed by new samples
+        ahead = [waiter for waiter in self._waiters if waiter.priority <= priority]
+        if arrival_time + self._estimate_queue_wait(ahead) + service_time > deadline and not is_idle:
+            self._reject('deadline')
+
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+            self._running_service_time += service_time
+            self._record_admission(0.0)
+            return service_time
+
+        if len(self._waiters) >= self.max_queue_size:
+            self._reject('queue_full')
+
+        waiter = _Waiter(priority=priority, order=next(self._arrival_counter), deadline=deadline,
+                         service_time=service_time, slot=asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        # lower priority requests were pushed back, some of them may not finish in time anymore
+        self._shed_late_waiters(behind=waiter, now=arrival_time)
+
+        # latest moment the request can still be started and finished in time
+        try:
+            await asyncio.wait({waiter.slot}, timeout=deadline - arrival_time - service_time)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        if not waiter.slot.done():
+            self._abandon(waiter)
+            self._reject('deadline')
+        # raises if the request was shed while queued
+        waiter.slot.result()
+
+        self._record_admission(self.clock() - arrival_time)
+        return service_time
+
+    def _release(self, priority: Priority, cost: float, service_time_estimate: float, service_time: float) -> None:
+        """
+        Release execution slot and record its service time
+
+        :param priority: Request priority class
+        :param cost: Relative request cost
+        :param service_time_estimate: Service time estimate of the request at admission [s]
+        :param service_time: Execution time of the released request [s]
+        """
+        self._service_times[priority].append((self.clock(), service_time / cost))
+        self._completed += 1
+        self._service_time_total += service_time
+        self._service_time_max = max(self._service_time_max, service_time)
+
+        self._running_service_time -= service_time_estimate
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        """
+        Hand the execution slot over to the first queued request, or free it
+        """
+        if self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            self._running_service_time += waiter.service_time
+            waiter.slot.set_result(None)
+        else:
+            self._running -= 1
+            if self._running == 0:
+                # discard accumulated rounding errors
+                self._running_service_time = 0.0
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """
+        Remove request from queue, e.g. after its deadline expired
+
+        :param waiter: Queued request
+        """
+        if not waiter.slot.done():
+            waiter.slot.cancel()
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+        elif waiter.slot.exception() is None:
+            # slot was handed over meanwhile, pass it on
+            self._running_service_time -= waiter.service_time
+            self._release_slot()
+
+    def _shed_late_waiters(self, behind: _Waiter, now: float) -> None:
+        """
+        Reject queued requests behind the given request which can no longer finish before their deadline
+
+        :param behind: Newly queued request
+        :param now: Current time (clock based) [s]
+        """
+        ahead: List[_Waiter] = []
+        for waiter in sorted(self._waiters):
+            if behind < waiter and now + self._estimate_queue_wait(ahead) + waiter.service_time > waiter.deadline:
+                self._waiters.remove(waiter)
+                self._shed['deadline'] += 1
+                waiter.slot.set_exception(self._rejection('deadline'))
+            else:
+                ahead.append(waiter)
+
+        heapq.heapify(self._waiters)
+
+    def _estimate_queue_wait(self, ahead: List[_Waiter]) -> float:
+        """
+        Estimate queue wait of a request, the slots are freed in waves of recent service times
+
+        :param ahead: Queued requests which are admitted before the request
+        :return: Queue wait estimate [s]
+        """
+        backlog = len(ahead) + self._running
+        if backlog < self.max_concurrency:
+            return 0.0
+
+        mean_service_time = (self._running_service_time + sum(waiter.service_time for waiter in ahead)) / backlog
+        return math.ceil(backlog / self.max_concurrency) * mean_service_time
+
+    def _estimate_service_time(self, priority: Priority, now: float) -> float:
+        """
+        Estimate service time per unit of cost as percentile of service times within the recent time window
+
+        :param priority: Request priority class
+        :param now: Current time (clock based) [s]
+        :return: Service time estimate [s]
+        """
+        service_times = self._service_times[priority]
+        while service_times and now - service_times[0][0] > self.service_time_window:
+            service_times.popleft()
+
+        if not service_times:
+            return 0.0
+
+        sorted_service_times = sorted(service_time for _, service_time in service_times)
+        return sorted_service_times[int(self.service_time_percentile * (len(sorted_service_times) - 1))]
+
+    def _record_admission(self, queue_wait: float) -> None:
+        """
+        Update admission metrics
+
+        :param queue_wait: Time spent waiting in queue [s]
+        """
+        self._admitted += 1
+        self._queue_wait_total += queue_wait
+        self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+
+    def _reject(self, reason: str) -> None:
+        """
+        Shed the request
+
+        :param reason: Rejection reason
+        :raises AdmissionRejectedError: Always
+        """
+        self._shed[reason] += 1
+        raise self._rejection(reason)
+
+    def _rejection(self, reason: str) -> AdmissionRejectedError:
+        """
+        Create rejection error, the client is asked to retry once the current backlog is drained
+
+        :param reason: Rejection reason
+        :return: Rejection error
+        """
+        retry_after = max(1, math.ceil(self._estimate_queue_wait(self._waiters)))
+
+        return AdmissionRejectedError(reason=reason, retry_after=retry_after)
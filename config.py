@@ -9,6 +9,12 @@ class Settings(BaseSettings):
     MONGODB_ATLAS_MOVIES_COLLECTION_NAME: str
     MONGODB_ATLAS_MOVIES_VECTOR_SEARCH_INDEX_NAME: str
 
+    # admission control of model-bound routes, queued requests wait on the event loop,
+    # only admitted requests occupy a worker thread (keep concurrency below the threadpool size of 40)
+    ADMISSION_MAX_CONCURRENCY: int = 4
+    ADMISSION_MAX_QUEUE_SIZE: int = 64
+    ADMISSION_DEFAULT_DEADLINE_MS: int = 5000
+
     class Config:
         env_file = '.env'
 
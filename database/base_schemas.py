@@ -0,0 +1,48 @@
+from typing import Optional, List
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+# maximum number of prompts in a single batch Semantic Search request
+SEMANTIC_SEARCH_BATCH_MAX_PROMPTS = 10
+
+
+class MovieBaseSchema(BaseModel):
+    """
+    Base Movie Schema
+    """
+    title: str = Field(...)
+    overview: str = Field(...)
+    homepage: Optional[str] = Field(None)
+    genres: Optional[List[str]] = Field(None)
+    runtime: Optional[int] = Field(None)
+    release_date: Optional[datetime] = Field(None)
+    budget: Optional[int] = Field(None)
+    revenue: Optional[int] = Field(None)
+
+    class Config:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "title": "The Lord of the Rings: The Rise of a New Power",
+                "overview": "As Middle-earth rebuilds after the War of the Ring, a new threat emerges, "
+                            "and the fellowship must reunite to face a power that threatens to plunge the world into darkness.",
+                "homepage": None,
+                "genres": ["Adventure", "Fantasy"],
+                "release_date": "2009-12-10T00:00:00.000+00:00",
+                "runtime": 160,
+                "budget": 280000000,
+                "revenue": None
+            }
+        }
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize Semantic Search prompt by collapsing repeated whitespace
+
+    :param prompt: Search prompt
+    :return: Normalized prompt
+    """
+    return ' '.join(prompt.split())
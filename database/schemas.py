@@ -1,42 +1,13 @@
-from typing import Optional, List, Any
+from typing import List, Any, Annotated
 
 from bson import ObjectId
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 
+from database.base_schemas import MovieBaseSchema, normalize_prompt, SEMANTIC_SEARCH_BATCH_MAX_PROMPTS
 from language_model import embedding_model, embedding_vector_length, TorchDevice
 
 
-class MovieBaseSchema(BaseModel):
-    """
-    Base Movie Schema
-    """
-    title: str = Field(...)
-    overview: str = Field(...)
-    homepage: Optional[str] = Field(None)
-    genres: Optional[List[str]] = Field(None)
-    runtime: Optional[int] = Field(None)
-    release_date: Optional[datetime] = Field(None)
-    budget: Optional[int] = Field(None)
-    revenue: Optional[int] = Field(None)
-
-    class Config:
-        populate_by_name = True
-        json_schema_extra = {
-            "example": {
-                "title": "The Lord of the Rings: The Rise of a New Power",
-                "overview": "As Middle-earth rebuilds after the War of the Ring, a new threat emerges, "
-                            "and the fellowship must reunite to face a power that threatens to plunge the world into darkness.",
-                "homepage": None,
-                "genres": ["Adventure", "Fantasy"],
-                "release_date": "2009-12-10T00:00:00.000+00:00",
-                "runtime": 160,
-                "budget": 280000000,
-                "revenue": None
-            }
-        }
-
-
 class MovieWithIDSchema(MovieBaseSchema):
     """
     Movie Schema with ID
@@ -98,12 +69,35 @@ class MovieWithEmbeddingSchema(MovieWithIDSchema):
         return instance
 
 
-class MoviesSemanticSearchPromptSchema(BaseModel):
+class MoviesSemanticSearchBaseSchema(BaseModel):
+    """
+    Base Schema for Movies Semantic Search
+    """
+    limit: int = Field(..., ge=1, le=10)
+
+    def get_optimal_number_of_search_candidates(self) -> int:
+        """
+        Get optimal number of Vector search candidates (per prompt).\n
+        Recommended by ANN search paper authors (used in MongoDB vector search algorithm), provides best latency-recall tradeoff
+
+        :return: Number of candidates
+        """
+        return 20 * self.limit
+
+
+class MoviesSemanticSearchPromptSchema(MoviesSemanticSearchBaseSchema):
     """
     Prompt Schema for Movies Semantic Search
     """
     prompt: str = Field(..., max_length=64)
-    limit: int = Field(..., ge=1, le=10)
+
+    @field_validator('prompt')
+    @classmethod
+    def validate_prompt(cls, prompt: str) -> str:
+        """
+        Normalize prompt, so that equivalent prompts give the same results
+        """
+        return normalize_prompt(prompt)
 
     def generate_embedding_vector(self) -> List[float]:
         """
@@ -114,11 +108,26 @@ class MoviesSemanticSearchPromptSchema(BaseModel):
         prompt_embedding = embedding_model.encode(self.prompt, device=TorchDevice.CPU.value).tolist()
         return prompt_embedding
 
-    def get_optimal_number_of_search_candidates(self) -> int:
+
+class MoviesSemanticSearchBatchPromptSchema(MoviesSemanticSearchBaseSchema):
+    """
+    Batch Prompt Schema for Movies Semantic Search
+    """
+    prompts: List[Annotated[str, Field(max_length=64)]] = Field(..., min_length=1, max_length=SEMANTIC_SEARCH_BATCH_MAX_PROMPTS)
+
+    @field_validator('prompts')
+    @classmethod
+    def validate_prompts(cls, prompts: List[str]) -> List[str]:
         """
-        Get optimal number of Vector search candidates.\n
-        Recommended by ANN search paper authors (used in MongoDB vector search algorithm), provides best latency-recall tradeoff
+        Normalize prompts the same way as in single prompt search
+        """
+        return [normalize_prompt(prompt) for prompt in prompts]
 
-        :return: Number of candidates
+    def generate_embedding_vectors(self) -> List[List[float]]:
         """
-        return 20 * self.limit
+        Generate prompt embedding vectors in a single model inference
+
+        :return: Prompt embeddings
+        """
+        prompt_embeddings = embedding_model.encode(self.prompts, device=TorchDevice.CPU.value).tolist()
+        return prompt_embeddings
@@ -6,6 +6,7 @@ import time
 
 from database.collections import mongodb_connection
 from routes.movies import movies_router
+from routes.metrics import metrics_router
 from utils import is_db_movies_collection_initialized, initialize_db_movies_collection_from_dataset
 
 
@@ -57,6 +58,7 @@ app = FastAPI(
 
 # routers
 app.include_router(movies_router)
+app.include_router(metrics_router)
 
 if __name__ == '__main__':
     uvicorn.run('main:app', host='127.0.0.1', port=8000, log_level='info', reload=True)
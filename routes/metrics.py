@@ -0,0 +1,28 @@
+from fastapi import APIRouter, status
+
+from routes.movies import title_lookup_flight, semantic_search_flight, admission_controller
+
+
+metrics_router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+
+@metrics_router.get(
+    path='/single-flight',
+    status_code=status.HTTP_200_OK
+)
+async def get_single_flight_metrics():
+    """
+    Get executed vs coalesced request counters of single-flight operations
+    """
+    return {flight.name: flight.get_stats() for flight in (title_lookup_flight, semantic_search_flight)}
+
+
+@metrics_router.get(
+    path='/admission',
+    status_code=status.HTTP_200_OK
+)
+async def get_admission_metrics():
+    """
+    Get admission control metrics of model-bound routes (queue wait, shed counts)
+    """
+    return admission_controller.get_stats()
@@ -1,27 +1,101 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+import asyncio
+import time
+
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
-from fastapi import APIRouter, Body, Path, Query, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, Path, Query, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import PlainTextResponse
 from pymongo.errors import DuplicateKeyError
 
+from admission_control import AdmissionController, AdmissionRejectedError, Priority
 from config import settings
 from database.collections import db_movies_collection
 from database.schemas import (MovieBaseSchema, MovieWithEmbeddingSchema, MovieWithIDSchema,
-                              MoviesSemanticSearchPromptSchema)
+                              MoviesSemanticSearchPromptSchema, MoviesSemanticSearchBatchPromptSchema)
+from single_flight import SingleFlight
 
 
 movies_router = APIRouter(prefix='/movies', tags=['movies'])
 
+# coalesce identical concurrent lookups and searches into a single model inference and DB round trip
+title_lookup_flight = SingleFlight(name='get_movie_by_title')
+# admission rejection concerns only the caller which started the search, other callers retry with their own deadline
+semantic_search_flight = SingleFlight(name='movies_semantic_search', unshared_errors=(AdmissionRejectedError,))
+
+# bound concurrency of embedding model inference and MongoDB work, shed requests which can not finish in time
+admission_controller = AdmissionController(max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+                                           max_queue_size=settings.ADMISSION_MAX_QUEUE_SIZE)
+
+
+async def _get_request_deadline(x_request_timeout_ms: Optional[int] = Header(None, gt=0)) -> float:
+    """
+    Get request deadline from 'X-Request-Timeout-Ms' header, or from the default timeout.\n
+    Resolved on the event loop, so the deadline clock starts before the request waits for a worker thread
+
+    :param x_request_timeout_ms: Request timeout [ms]
+    :return: Request deadline (time.monotonic() based) [s]
+    """
+    timeout_ms = x_request_timeout_ms or settings.ADMISSION_DEFAULT_DEADLINE_MS
+    return time.monotonic() + timeout_ms / 1000
+
+
+async def _run_admitted(priority: Priority, deadline: float, fn: Callable[..., Any], *args: Any,
+                        cost: float = 1.0) -> Any:
+    """
+    Run blocking function in threadpool once admitted by admission control, queued requests wait on the event loop
+
+    :param priority: Request priority class
+    :param deadline: Request deadline (time.monotonic() based) [s]
+    :param fn: Blocking function (embedding model inference, MongoDB operations)
+    :param cost: Relative request cost (number of searched prompts)
+    :return: Function result
+    :raises AdmissionRejectedError: If the request is shed
+    """
+    async with admission_controller.admit(priority=priority, deadline=deadline, cost=cost):
+        return await run_in_threadpool(fn, *args)
+
+
+@contextmanager
+def _shed_as_service_unavailable() -> Iterator[None]:
+    """
+    Reject requests which can not be served in time with 503 Service Unavailable
+    """
+    try:
+        yield
+    except AdmissionRejectedError as err:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail='Server overloaded, please retry later',
+                            headers={'Retry-After': str(err.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail='Request deadline exceeded, please retry later',
+                            headers={'Retry-After': '1'})
+
 
 @movies_router.post(
     path='/',
     response_class=PlainTextResponse,
     status_code=status.HTTP_201_CREATED
 )
-def insert_movie(movie: MovieBaseSchema = Body(...)):
+async def insert_movie(movie: MovieBaseSchema = Body(...),
+                       deadline: float = Depends(_get_request_deadline)):
     """
     Insert Movie into MongoDB
     """
+    with _shed_as_service_unavailable():
+        return await _run_admitted(Priority.WRITE, deadline, _insert_movie, movie)
+
+
+def _insert_movie(movie: MovieBaseSchema) -> PlainTextResponse:
+    """
+    Calculate Movie embedding and insert Movie into MongoDB
+
+    :param movie: Movie object as MovieBaseSchema
+    :return: Response with inserted Movie ID
+    """
     movie_with_embedding = MovieWithEmbeddingSchema.from_base_schema(movie)
 
     try:
@@ -59,26 +133,17 @@ def get_movie_by_id(movie_id: str = Path(...)):
     response_class=PlainTextResponse,
     status_code=status.HTTP_200_OK
 )
-def update_movie_by_id(movie_id: str = Path(...),
-                       updated_movie: MovieBaseSchema = Body(...)):
+async def update_movie_by_id(movie_id: str = Path(...),
+                             updated_movie: MovieBaseSchema = Body(...),
+                             deadline: float = Depends(_get_request_deadline)):
     """
     Update Movie by ID in MongoDB
     """
     if not ObjectId.is_valid(movie_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid movie ID')
 
-    existing_movie = db_movies_collection.find_one({'_id': ObjectId(movie_id)})
-    if not existing_movie:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Movie not found')
-
-    updated_movie_with_embedding = MovieWithEmbeddingSchema.from_base_schema(updated_movie)
-    res = db_movies_collection.update_one({'_id': ObjectId(movie_id)},
-                                          {'$set': updated_movie_with_embedding.model_dump(exclude={'id', 'created_at'})})
-
-    if res.matched_count == 0 or res.modified_count == 0:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='Failed to update movie')
-
-    return PlainTextResponse(content='Movie updated successfully')
+    with _shed_as_service_unavailable():
+        return await _run_admitted(Priority.WRITE, deadline, _update_movie, {'_id': ObjectId(movie_id)}, updated_movie)
 
 
 @movies_router.delete(
@@ -105,11 +170,11 @@ def delete_movie_by_id(movie_id: str = Path(...)):
     response_model=MovieBaseSchema,
     status_code=status.HTTP_200_OK
 )
-def get_movie_by_title(movie_title: str = Query(...)):
+async def get_movie_by_title(movie_title: str = Query(...)):
     """
     Get Movie by Title from MongoDB
     """
-    movie = db_movies_collection.find_one({'title': movie_title})
+    movie = await title_lookup_flight.do(movie_title, run_in_threadpool, _find_movie_by_title, movie_title)
 
     if movie:
         return MovieBaseSchema(**movie)
@@ -117,23 +182,46 @@ def get_movie_by_title(movie_title: str = Query(...)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Movie not found')
 
 
+def _find_movie_by_title(movie_title: str) -> Optional[dict]:
+    """
+    Find Movie document by Title in MongoDB
+
+    :param movie_title: Movie Title
+    :return: Movie document or None
+    """
+    return db_movies_collection.find_one({'title': movie_title})
+
+
 @movies_router.put(
     path='/title',
     response_class=PlainTextResponse,
     status_code=status.HTTP_200_OK
 )
-def update_movie_by_title(movie_title: str = Query(...),
-                          updated_movie: MovieBaseSchema = Body(...)):
+async def update_movie_by_title(movie_title: str = Query(...),
+                                updated_movie: MovieBaseSchema = Body(...),
+                                deadline: float = Depends(_get_request_deadline)):
     """
     Update Movie by Title in MongoDB
     """
-    existing_movie = db_movies_collection.find_one({'title': movie_title})
+    with _shed_as_service_unavailable():
+        return await _run_admitted(Priority.WRITE, deadline, _update_movie, {'title': movie_title}, updated_movie)
+
+
+def _update_movie(movie_filter: dict, updated_movie: MovieBaseSchema) -> PlainTextResponse:
+    """
+    Calculate Movie embedding and update Movie in MongoDB
+
+    :param movie_filter: Filter matching the Movie to update
+    :param updated_movie: Updated Movie object as MovieBaseSchema
+    :return: Response with update status
+    """
+    existing_movie = db_movies_collection.find_one(movie_filter)
 
     if not existing_movie:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Movie not found')
 
     updated_movie_with_embedding = MovieWithEmbeddingSchema.from_base_schema(updated_movie)
-    res = db_movies_collection.update_one({'title': movie_title},
+    res = db_movies_collection.update_one(movie_filter,
                                           {'$set': updated_movie_with_embedding.model_dump(exclude={'id', 'created_at'})})
 
     if res.matched_count == 0 or res.modified_count == 0:
@@ -164,24 +252,88 @@ def delete_movie_by_title(movie_title: str = Query(...)):
     response_model=list[MovieBaseSchema],
     status_code=status.HTTP_200_OK
 )
-def movies_semantic_search(prompt: str = Query(..., title='Search Prompt', max_length=64),
-                           limit: int = Query(..., title='Limit returned documents', ge=1, le=10)):
+async def movies_semantic_search(prompt: str = Query(..., title='Search Prompt', max_length=64),
+                                 limit: int = Query(..., title='Limit returned documents', ge=1, le=10),
+                                 deadline: float = Depends(_get_request_deadline)):
     """
     Perform Semantic Search on Movies collection
     """
+    # prompt is normalized by the schema, so that equivalent prompts share a single search
     semantic_search_prompt = MoviesSemanticSearchPromptSchema(prompt=prompt, limit=limit)
 
-    # perform vector search
+    with _shed_as_service_unavailable():
+        # each caller waits for the shared search only until its own deadline
+        movies = await semantic_search_flight.do((semantic_search_prompt.prompt, semantic_search_prompt.limit),
+                                                 _run_admitted, Priority.READ, deadline,
+                                                 _semantic_search_movies, semantic_search_prompt,
+                                                 timeout=deadline - time.monotonic())
+
+    return [MovieBaseSchema(**movie) for movie in movies]
+
+
+@movies_router.post(
+    path='/semantic-search/batch',
+    response_model=list[list[MovieBaseSchema]],
+    status_code=status.HTTP_200_OK
+)
+async def movies_semantic_search_batch(search_prompts: MoviesSemanticSearchBatchPromptSchema = Body(...),
+                                       deadline: float = Depends(_get_request_deadline)):
+    """
+    Perform Semantic Search on Movies collection for multiple prompts, embeddings are computed in a single batch
+    """
+    with _shed_as_service_unavailable():
+        results = await _run_admitted(Priority.READ, deadline, _semantic_search_movies_batch, search_prompts,
+                                      cost=len(search_prompts.prompts))
+
+    return [[MovieBaseSchema(**movie) for movie in movies] for movies in results]
+
+
+def _semantic_search_movies(semantic_search_prompt: MoviesSemanticSearchPromptSchema) -> list[dict]:
+    """
+    Perform Semantic Search on Movies collection
+
+    :param semantic_search_prompt: Semantic Search Prompt
+    :return: List of Movie documents
+    """
+    return _vector_search_movies(query_vector=semantic_search_prompt.generate_embedding_vector(),
+                                 limit=semantic_search_prompt.limit,
+                                 num_candidates=semantic_search_prompt.get_optimal_number_of_search_candidates())
+
+
+def _semantic_search_movies_batch(search_prompts: MoviesSemanticSearchBatchPromptSchema) -> list[list[dict]]:
+    """
+    Perform Semantic Search on Movies collection for multiple prompts
+
+    :param search_prompts: Semantic Search Batch Prompt
+    :return: List of Movie documents per prompt
+    """
+    query_vectors = search_prompts.generate_embedding_vectors()
+    num_candidates = search_prompts.get_optimal_number_of_search_candidates()
+
+    return [_vector_search_movies(query_vector=query_vector, limit=search_prompts.limit, num_candidates=num_candidates)
+            for query_vector in query_vectors]
+
+
+def _vector_search_movies(query_vector: list[float], limit: int, num_candidates: int) -> list[dict]:
+    """
+    Perform Vector Search on Movies collection
+
+    :param query_vector: Query embedding vector
+    :param limit: Number of returned documents
+    :param num_candidates: Number of Vector search candidates
+    :return: List of Movie documents
+    """
     res = db_movies_collection.aggregate([
         {
             '$vectorSearch': {
                 'index': settings.MONGODB_ATLAS_MOVIES_VECTOR_SEARCH_INDEX_NAME,
                 'path': 'embedding',
-                'queryVector': semantic_search_prompt.generate_embedding_vector(),
-                'numCandidates': semantic_search_prompt.get_optimal_number_of_search_candidates(),
-                'limit': semantic_search_prompt.limit,
+                'queryVector': query_vector,
+                'numCandidates': num_candidates,
+                'limit': limit,
             }
         }
     ])
 
-    return [MovieBaseSchema(**movie) for movie in res]
+    # exhaust the cursor, so the documents can be shared between coalesced callers
+    return list(res)
@@ -0,0 +1,187 @@
+from typing import Any, Callable, Hashable, Optional
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from cachetools import TTLCache
+
+from database.base_schemas import MovieBaseSchema, normalize_prompt, SEMANTIC_SEARCH_BATCH_MAX_PROMPTS
+
+
+class SemanticSearchClient:
+    """
+    Semantic Search API Client.\n
+    Reuses pooled keep-alive connections and memoizes responses for a limited time (TTL).
+    Failed requests raise requests.HTTPError, only a missing movie is reported as an empty result.
+    """
+    def __init__(self, server_url: str, timeout: float = 10.0, pool_maxsize: int = 10,
+                 cache_ttl: float = 300.0, cache_maxsize: int = 256) -> None:
+        """
+        Semantic Search API Client
+
+        :param server_url: API server URL
+        :param timeout: Request timeout [s]
+        :param pool_maxsize: Maximum number of pooled connections
+        :param cache_ttl: Response cache time to live [s]
+        :param cache_maxsize: Maximum number of cached responses
+        """
+        self.server_url = server_url.rstrip('/')
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
+        self._cache_lock = threading.Lock()
+
+    def find_movie_by_title(self, movie_title: str) -> list[MovieBaseSchema]:
+        """
+        Find Movie by Title
+
+        :param movie_title: Movie Title
+        :return: List with found Movie Object, empty if not found
+        """
+        movie = self._cached(('title', movie_title), self._get_json,
+                             '/movies/title', {'movie_title': movie_title}, True)
+
+        return [MovieBaseSchema(**movie)] if movie else []
+
+    def semantic_search(self, query: str, limit: int) -> list[MovieBaseSchema]:
+        """
+        Perform Semantic Search
+
+        :param query: Search Query
+        :param limit: Number of returned documents
+        :return: List of Movie Objects
+        """
+        query = normalize_prompt(query)
+        movies = self._cached(('semantic-search', query, limit), self._get_json,
+                              '/movies/semantic-search', {'prompt': query, 'limit': limit})
+
+        return [MovieBaseSchema(**movie) for movie in movies]
+
+    def semantic_search_many(self, queries: list[str], limit: int) -> list[list[MovieBaseSchema]]:
+        """
+        Perform Semantic Search for multiple queries.\n
+        Queries missing from the cache are sent to the batch endpoint, split into batches of the maximum allowed size.
+
+        :param queries: Search Queries
+        :param limit: Number of returned documents per query
+        :return: List of Movie Objects per query
+        """
+        queries = [normalize_prompt(query) for query in queries]
+
+        results = {}
+        with self._cache_lock:
+            for query in queries:
+                if ('semantic-search', query, limit) in self._cache:
+                    results[query] = self._cache[('semantic-search', query, limit)]
+
+        missing_queries = list(dict.fromkeys(query for query in queries if query not in results))
+        for i in range(0, len(missing_queries), SEMANTIC_SEARCH_BATCH_MAX_PROMPTS):
+            batch_queries = missing_queries[i:i + SEMANTIC_SEARCH_BATCH_MAX_PROMPTS]
+            batch_results = self._post_json('/movies/semantic-search/batch', {'prompts': batch_queries, 'limit': limit})
+
+            with self._cache_lock:
+                for query, movies in zip(batch_queries, batch_results):
+                    self._cache[('semantic-search', query, limit)] = movies
+                    results[query] = movies
+
+        return [[MovieBaseSchema(**movie) for movie in results[query]] for query in queries]
+
+    async def afind_movie_by_title(self, movie_title: str) -> list[MovieBaseSchema]:
+        """
+        Find Movie by Title (async)
+
+        :param movie_title: Movie Title
+        :return: List with found Movie Object, empty if not found
+        """
+        return await asyncio.to_thread(self.find_movie_by_title, movie_title)
+
+    async def asemantic_search(self, query: str, limit: int) -> list[MovieBaseSchema]:
+        """
+        Perform Semantic Search (async)
+
+        :param query: Search Query
+        :param limit: Number of returned documents
+        :return: List of Movie Objects
+        """
+        return await asyncio.to_thread(self.semantic_search, query, limit)
+
+    async def asemantic_search_many(self, queries: list[str], limit: int) -> list[list[MovieBaseSchema]]:
+        """
+        Perform Semantic Search for multiple queries (async)
+
+        :param queries: Search Queries
+        :param limit: Number of returned documents per query
+        :return: List of Movie Objects per query
+        """
+        return await asyncio.to_thread(self.semantic_search_many, queries, limit)
+
+    def clear_cache(self) -> None:
+        """
+        Clear cached responses
+        """
+        with self._cache_lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        """
+        Close pooled connections
+        """
+        self.session.close()
+
+    def _cached(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Get response from cache, or request it and cache successful response
+
+        :param key: Cache key
+        :param fn: Request function
+        :return: Response JSON, None if not found
+        """
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        res = fn(*args)
+
+        if res is not None:
+            with self._cache_lock:
+                self._cache[key] = res
+
+        return res
+
+    def _get_json(self, path: str, params: dict, not_found_ok: bool = False) -> Optional[Any]:
+        """
+        Send GET request (query parameters are URL encoded)
+
+        :param path: Endpoint path
+        :param params: Query parameters
+        :param not_found_ok: Return None instead of raising on 404 Not Found
+        :return: Response JSON, None if not found
+        :raises requests.HTTPError: If request failed
+        """
+        response = self.session.get(url=f'{self.server_url}{path}', params=params, timeout=self.timeout)
+
+        if not_found_ok and response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+        return response.json()
+
+    def _post_json(self, path: str, body: dict) -> Any:
+        """
+        Send POST request
+
+        :param path: Endpoint path
+        :param body: JSON body
+        :return: Response JSON
+        :raises requests.HTTPError: If request failed
+        """
+        response = self.session.post(url=f'{self.server_url}{path}', json=body, timeout=self.timeout)
+        response.raise_for_status()
+
+        return response.json()
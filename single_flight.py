@@ -0,0 +1,132 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type
+import asyncio
+import copy
+
+
+class _InFlightCall:
+    """
+    Single in-flight call shared by all callers with the same key
+    """
+    def __init__(self, task: asyncio.Task, owner: object) -> None:
+        self.task = task
+        self.owner = owner
+
+
+class SingleFlight:
+    """
+    Single-flight request coalescing.\n
+    Concurrent calls with the same key share one execution of the wrapped coroutine function, all callers receive its result.
+    Nothing is cached, once the call completes the next call with the same key is executed again.
+    """
+    def __init__(self, name: str, unshared_errors: Tuple[Type[BaseException], ...] = ()) -> None:
+        """
+        Single-flight request coalescing
+
+        :param name: Name of the coalesced operation (used in stats)
+        :param unshared_errors: Errors specific to the caller which started the call (e.g. its deadline was exceeded),
+                                other waiting callers retry the call instead of receiving the error
+        """
+        self.name = name
+        self.unshared_errors = unshared_errors
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self._executed = 0
+        self._coalesced = 0
+        self._timed_out = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any,
+                 timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Execute coroutine function, or wait for the result of an identical in-flight call.\n
+        Each caller waits at most for its own timeout, the shared call keeps running for the other callers.
+
+        :param key: Key identifying identical calls (normalized call parameters)
+        :param fn: Coroutine function to execute
+        :param timeout: Maximum waiting time of this caller [s], None to wait until the call completes
+        :return: Function result
+        :raises TimeoutError: If the call did not complete within the timeout
+        """
+        caller = object()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        while True:
+            call = self._calls.get(key)
+            if call is not None and not call.task.done():
+                self._coalesced += 1
+            else:
+                call = _InFlightCall(task=asyncio.ensure_future(fn(*args, **kwargs)), owner=caller)
+                self._calls[key] = call
+                self._executed += 1
+                call.task.add_done_callback(lambda _, call=call: self._complete_call(key, call))
+
+            # waiting does not cancel the shared task on timeout or cancellation of this caller
+            await asyncio.wait({call.task}, timeout=self._remaining(deadline, loop))
+            if not call.task.done():
+                self._timed_out += 1
+                raise asyncio.TimeoutError(f'{self.name} call did not complete within timeout')
+
+            error = call.task.exception()
+            if error is None:
+                return call.task.result()
+            if call.owner is not caller and isinstance(error, self.unshared_errors):
+                # error concerns only the caller which started the call, retry on behalf of this caller
+                if self._remaining(deadline, loop) == 0.0:
+                    self._timed_out += 1
+                    raise asyncio.TimeoutError(f'{self.name} call did not complete within timeout') from error
+                continue
+            # raise a copy, so that the exception shared between callers is never modified
+            raise _copy_error(error) from error
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get executed/coalesced call counters
+
+        :return: Stats dictionary
+        """
+        return {'executed': self._executed,
+                'coalesced': self._coalesced,
+                'timed_out': self._timed_out,
+                'in_flight': len(self._calls)}
+
+    @staticmethod
+    def _remaining(deadline: Optional[float], loop: asyncio.AbstractEventLoop) -> Optional[float]:
+        """
+        Get remaining waiting time of the caller
+
+        :param deadline: Caller deadline (event loop time based), None to wait without limit
+        :param loop: Running event loop
+        :return: Remaining time [s] (0 if the deadline passed), None without deadline
+        """
+        if deadline is None:
+            return None
+        return max(0.0, deadline - loop.time())
+
+    def _complete_call(self, key: Hashable, call: _InFlightCall) -> None:
+        """
+        Remove completed call, so that the next call with the same key is executed again
+
+        :param key: Call key
+        :param call: Completed call
+        """
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+        # mark the error as retrieved, all callers may have timed out before the call failed
+        if not call.task.cancelled():
+            call.task.exception()
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    """
+    Copy exception without its traceback
+
+    :param error: Exception
+    :return: Exception copy
+    """
+    try:
+        error_copy = copy.copy(error)
+    except Exception:
+        # exception can not be reconstructed from its args, fall back to the generic error
+        return RuntimeError(f'Coalesced call failed: {error!r}')
+
+    return error_copy.with_traceback(None)
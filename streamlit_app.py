@@ -1,9 +1,7 @@
-from typing import Union
-
 import streamlit as st
 import requests
 
-from database.schemas import MovieBaseSchema
+from search_client import SemanticSearchClient
 
 
 ### Configuration ###
@@ -13,40 +11,21 @@ st.set_page_config(page_title="MUG Belgrade", page_icon="./assets/mongodb_logo.s
 ### Initialize Session State ###
 if "server_url" not in st.session_state:
     st.session_state.server_url = "http://127.0.0.1:8000"
-    st.session_state.title_search_url = f"{st.session_state.server_url}/movies/title"
-    st.session_state.semantic_search_url = f"{st.session_state.server_url}/movies/semantic-search"
 
 
 ### Helper functions ###
-def find_movie_by_title(movie_title: str) -> list[MovieBaseSchema]:
+@st.cache_resource
+def get_search_client(server_url: str) -> SemanticSearchClient:
     """
-    Find Movie by Title
+    Get Semantic Search API Client, shared across reruns and sessions
 
-    :param movie_title: Movie Title
-    :return: Movie Object
+    :param server_url: API server URL
+    :return: Semantic Search API Client
     """
-    response = requests.get(url=f"{st.session_state.title_search_url}/?movie_title={movie_title}")
+    return SemanticSearchClient(server_url=server_url)
 
-    if response.status_code == 200:
-        return [MovieBaseSchema(**response.json())]
-    else:
-        return []
 
-
-def semantic_search(query: str, limit: int) -> list[MovieBaseSchema]:
-    """
-    Perform Semantic Search
-
-    :param query: Search Query
-    :param limit: Number of returned documents
-    :return: List of Movie Objects
-    """
-    response = requests.get(url=f"{st.session_state.semantic_search_url}/?prompt={query}&limit={limit}")
-
-    if response.status_code == 200:
-        return [MovieBaseSchema(**movie) for movie in response.json()]
-    else:
-        return []
+search_client = get_search_client(st.session_state.server_url)
 
 
 ### Sidebar ###
@@ -107,12 +86,19 @@ if search_button:
     if len(search_query) > 0:
         with st.columns([1.2, 1.2, 1])[1]:
             with st.spinner('Searching... Please wait'):
-                if search_type == "Classic Search":
-                    found_movies = find_movie_by_title(search_query)
-                else:
-                    found_movies = semantic_search(search_query, n_search_results)
-
-        if len(found_movies) == 0:
+                try:
+                    if search_type == "Classic Search":
+                        found_movies = search_client.find_movie_by_title(search_query)
+                    else:
+                        found_movies = search_client.semantic_search(search_query, n_search_results)
+                    search_failed = False
+                except requests.RequestException:
+                    found_movies = []
+                    search_failed = True
+
+        if search_failed:
+            st.error("Search failed. Please try again later.")
+        elif len(found_movies) == 0:
             st.error("No movies found. Please try again.")
 
         for movie in found_movies:
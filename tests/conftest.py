@@ -0,0 +1,52 @@
+"""
+Test doubles for the embedding model and the MongoDB collection,
+so that routes can be tested without downloading the model and without MongoDB Atlas cluster
+"""
+from enum import Enum
+from unittest.mock import MagicMock
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+for setting_name in ('MONGODB_ATLAS_USERNAME', 'MONGODB_ATLAS_PASSWORD', 'MONGODB_ATLAS_HOST', 'MONGODB_ATLAS_DB_NAME',
+                     'MONGODB_ATLAS_MOVIES_COLLECTION_NAME', 'MONGODB_ATLAS_MOVIES_VECTOR_SEARCH_INDEX_NAME'):
+    os.environ.setdefault(setting_name, 'test')
+
+
+EMBEDDING_VECTOR_LENGTH = 384
+
+
+class TorchDevice(Enum):
+    CPU = 'cpu'
+    GPU = 'cuda'
+    AUTO = None
+
+
+class FakeEmbeddingModel:
+    def encode(self, sentences, device=None, batch_size=None) -> np.ndarray:
+        if isinstance(sentences, str):
+            return np.zeros(EMBEDDING_VECTOR_LENGTH)
+        return np.zeros((len(sentences), EMBEDDING_VECTOR_LENGTH))
+
+
+language_model = types.ModuleType('language_model')
+language_model.TorchDevice = TorchDevice
+language_model.embedding_model = FakeEmbeddingModel()
+language_model.embedding_vector_length = EMBEDDING_VECTOR_LENGTH
+sys.modules['language_model'] = language_model
+
+database_collections = types.ModuleType('database.collections')
+database_collections.mongodb_connection = MagicMock()
+database_collections.db_movies_collection = MagicMock()
+sys.modules['database.collections'] = database_collections
+
+
+@pytest.fixture
+def movies_collection() -> MagicMock:
+    collection = database_collections.db_movies_collection
+    collection.reset_mock(return_value=True, side_effect=True)
+    return collection
@@ -0,0 +1,281 @@
+import asyncio
+import copy
+
+import pytest
+
+from admission_control import AdmissionController, AdmissionRejectedError, Priority
+
+
+class FakeClock:
+    """
+    Controllable clock, time advances only when the test says so
+    """
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+async def _run_request(controller: AdmissionController, priority: Priority = Priority.READ, deadline: float = 10.0,
+                       cost: float = 1.0, duration: float = 0.0, release: asyncio.Event = None) -> None:
+    """
+    Run request through the controller, it takes the given (fake clock) duration or holds its slot until released
+    """
+    async with controller.admit(priority=priority, deadline=controller.clock() + deadline, cost=cost):
+        if release is not None:
+            await release.wait()
+        if isinstance(controller.clock, FakeClock):
+            controller.clock.advance(duration)
+
+
+def _start(controller: AdmissionController, **kwargs) -> asyncio.Future:
+    return asyncio.ensure_future(_run_request(controller, **kwargs))
+
+
+def _rejection(request: asyncio.Future) -> str:
+    assert request.done()
+    assert isinstance(request.exception(), AdmissionRejectedError)
+    return request.exception().reason
+
+
+def test_reads_are_admitted_before_queued_writes():
+    controller = AdmissionController(max_concurrency=1, max_queue_size=10)
+    admitted = []
+
+    async def request(name: str, priority: Priority):
+        async with controller.admit(priority=priority, deadline=controller.clock() + 10):
+            admitted.append(name)
+
+    async def run():
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+        requests = []
+        for name, priority in [('write_1', Priority.WRITE), ('write_2', Priority.WRITE),
+                               ('read_1', Priority.READ), ('read_2', Priority.READ)]:
+            requests.append(asyncio.ensure_future(request(name, priority)))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *requests)
+
+    asyncio.run(run())
+
+    assert admitted == ['read_1', 'read_2', 'write_1', 'write_2']
+    assert controller.get_stats()['running'] == 0
+
+
+def test_requests_over_queue_bound_are_shed():
+    controller = AdmissionController(max_concurrency=1, max_queue_size=2)
+
+    async def run():
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+        queued = [_start(controller) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as err:
+            await _run_request(controller)
+        release.set()
+        await asyncio.gather(holder, *queued)
+        return err.value
+
+    err = asyncio.run(run())
+
+    assert err.reason == 'queue_full'
+    assert err.retry_after >= 1
+    stats = controller.get_stats()
+    assert stats['shed_queue_full'] == 1
+    assert stats['admitted'] == 3
+    assert stats['queued'] == 0
+
+
+def test_requests_which_can_not_finish_in_time_are_shed_on_arrival():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=1, max_queue_size=64, clock=clock)
+
+    async def run():
+        await _run_request(controller, duration=0.1)
+        release = asyncio.Event()
+        holder = _start(controller, release=release, duration=0.1)
+        await asyncio.sleep(0)
+
+        requests = [_start(controller, deadline=0.55, duration=0.1) for _ in range(20)]
+        # rejections are decided on arrival, before any time passes
+        await asyncio.sleep(0)
+        rejected = [request for request in requests if request.done()]
+        assert [_rejection(request) for request in rejected] == ['deadline'] * 16
+        assert rejected == requests[4:]
+
+        release.set()
+        await asyncio.gather(holder, *requests[:4])
+
+    asyncio.run(run())
+
+    stats = controller.get_stats()
+    assert stats['shed_deadline'] == 16
+    assert stats['admitted'] == 6
+
+
+def test_request_is_shed_on_arrival_when_service_time_exceeds_deadline():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=2, max_queue_size=10, clock=clock)
+
+    async def run():
+        await _run_request(controller, duration=0.1)
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+        # a slot is free, but the estimated service time exceeds the deadline
+        request = _start(controller, deadline=0.05)
+        await asyncio.sleep(0)
+        reason = _rejection(request)
+        release.set()
+        await holder
+        return reason
+
+    assert asyncio.run(run()) == 'deadline'
+
+
+def test_queued_writes_pushed_back_by_reads_are_shed():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=1, max_queue_size=10, clock=clock)
+
+    async def run():
+        await _run_request(controller, priority=Priority.READ, duration=0.1)
+        await _run_request(controller, priority=Priority.WRITE, duration=0.1)
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+
+        # fits behind the running request
+        write = _start(controller, priority=Priority.WRITE, deadline=0.35)
+        await asyncio.sleep(0)
+        reads = [_start(controller, priority=Priority.READ)]
+        await asyncio.sleep(0)
+        assert not write.done()
+
+        # second read pushes the write behind its deadline, it is shed as soon as the read is queued
+        reads.append(_start(controller, priority=Priority.READ))
+        await asyncio.sleep(0)
+        assert controller.get_stats()['queued'] == 2
+        with pytest.raises(AdmissionRejectedError) as err:
+            await write
+        assert not holder.done()
+
+        release.set()
+        await asyncio.gather(holder, *reads)
+        return err.value.reason
+
+    assert asyncio.run(run()) == 'deadline'
+    stats = controller.get_stats()
+    assert stats['shed_deadline'] == 1
+    assert stats['queued'] == 0
+    assert stats['running'] == 0
+
+
+def test_queued_request_is_shed_when_its_deadline_expires():
+    controller = AdmissionController(max_concurrency=1, max_queue_size=10)
+
+    async def run():
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as err:
+            await _run_request(controller, deadline=0.05)
+        # rejected at its deadline, while the running request still holds its slot
+        assert not holder.done()
+        release.set()
+        await holder
+        return err.value
+
+    err = asyncio.run(run())
+
+    assert err.reason == 'deadline'
+    stats = controller.get_stats()
+    assert stats['shed_deadline'] == 1
+    assert stats['queued'] == 0
+    assert stats['running'] == 0
+
+
+def test_service_time_estimate_recovers_after_slow_request():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=2, max_queue_size=10, service_time_window=30.0, clock=clock)
+
+    async def run():
+        # single slow request pushes the estimate above the deadline of following requests
+        await _run_request(controller, duration=0.2)
+        assert controller.get_stats()['service_time_estimate_read_s'] == pytest.approx(0.2)
+
+        # idle controller still admits requests, their fast samples bring the estimate down
+        for _ in range(100):
+            await _run_request(controller, deadline=0.1, duration=0.01)
+        assert controller.get_stats()['service_time_estimate_read_s'] == pytest.approx(0.01)
+
+        # old samples expire
+        clock.advance(31.0)
+        assert controller.get_stats()['service_time_estimate_read_s'] == 0.0
+
+    asyncio.run(run())
+
+    stats = controller.get_stats()
+    assert stats['admitted'] == 101
+    assert stats['shed_deadline'] == 0
+
+
+def test_service_time_is_estimated_per_priority_class_and_unit_of_cost():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=2, max_queue_size=10, clock=clock)
+
+    async def run():
+        # batch of 10 prompts
+        await _run_request(controller, cost=10, duration=1.0)
+        await _run_request(controller, priority=Priority.WRITE, duration=0.5)
+
+        release = asyncio.Event()
+        holder = _start(controller, release=release)
+        await asyncio.sleep(0)
+        # single search fits its deadline, the batch sample does not inflate its estimate
+        await _run_request(controller, deadline=0.15, duration=0.1)
+        # batch of 3 prompts does not fit the same deadline
+        with pytest.raises(AdmissionRejectedError):
+            await _run_request(controller, deadline=0.15, cost=3)
+        release.set()
+        await holder
+
+    asyncio.run(run())
+
+    stats = controller.get_stats()
+    assert stats['service_time_estimate_read_s'] == pytest.approx(0.1)
+    assert stats['service_time_estimate_write_s'] == pytest.approx(0.5)
+
+
+def test_queue_wait_and_service_time_are_recorded_separately():
+    clock = FakeClock()
+    controller = AdmissionController(max_concurrency=1, max_queue_size=10, clock=clock)
+
+    async def run():
+        release = asyncio.Event()
+        holder = _start(controller, release=release, duration=0.1)
+        await asyncio.sleep(0)
+        queued = _start(controller, duration=0.02)
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, queued)
+
+    asyncio.run(run())
+
+    stats = controller.get_stats()
+    assert stats['queue_wait_max_s'] == pytest.approx(0.1)
+    assert stats['queue_wait_avg_s'] == pytest.approx(0.05)
+    assert stats['service_time_max_s'] == pytest.approx(0.1)
+    assert stats['service_time_avg_s'] == pytest.approx(0.06)
+
+
+def test_rejection_error_can_be_copied():
+    err = copy.copy(AdmissionRejectedError(reason='deadline', retry_after=3))
+
+    assert (err.reason, err.retry_after) == ('deadline', 3)
@@ -0,0 +1,180 @@
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.movies
+from admission_control import AdmissionController, AdmissionRejectedError, Priority
+from routes.movies import movies_router
+from single_flight import SingleFlight
+
+
+def _movie(title: str) -> dict:
+    return {'title': title, 'overview': f'{title} overview'}
+
+
+@pytest.fixture
+def app(monkeypatch) -> FastAPI:
+    monkeypatch.setattr(routes.movies, 'title_lookup_flight', SingleFlight(name='get_movie_by_title'))
+    monkeypatch.setattr(routes.movies, 'semantic_search_flight',
+                        SingleFlight(name='movies_semantic_search', unshared_errors=(AdmissionRejectedError,)))
+    monkeypatch.setattr(routes.movies, 'admission_controller', AdmissionController(max_concurrency=4, max_queue_size=64))
+
+    app = FastAPI()
+    app.include_router(movies_router)
+    return app
+
+
+class RecordingAdmissionController:
+    """
+    Admission Controller double, records admissions and rejects the first requests with the given errors
+    """
+    def __init__(self, *rejections: AdmissionRejectedError, reject_after: float = 0.0) -> None:
+        self.rejections = list(rejections)
+        self.reject_after = reject_after
+        self.admissions = []
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority, deadline: float, cost: float = 1.0):
+        self.admissions.append({'priority': priority, 'timeout': deadline - time.monotonic(), 'cost': cost})
+        if self.rejections:
+            await asyncio.sleep(self.reject_after)
+            raise self.rejections.pop(0)
+        yield
+
+
+def _send_concurrently(app: FastAPI, *requests: tuple) -> list[httpx.Response]:
+    """
+    Send requests concurrently to the application, requests are given as (method, url, kwargs)
+    """
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            return await asyncio.gather(*[client.request(method, url, **kwargs) for method, url, kwargs in requests])
+
+    return asyncio.run(send())
+
+
+def _slow(result, delay: float = 0.2):
+    def fn(*args, **kwargs):
+        time.sleep(delay)
+        return result
+
+    return fn
+
+
+def test_identical_title_lookups_share_one_query(app, movies_collection):
+    movies_collection.find_one.side_effect = _slow(_movie('Avatar'))
+
+    responses = _send_concurrently(app, *[('GET', '/movies/title', {'params': {'movie_title': 'Avatar'}})] * 5)
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert all(response.json()['title'] == 'Avatar' for response in responses)
+    movies_collection.find_one.assert_called_once_with({'title': 'Avatar'})
+
+
+def test_coalesced_title_lookup_not_found(app, movies_collection):
+    movies_collection.find_one.side_effect = _slow(None)
+
+    responses = _send_concurrently(app, *[('GET', '/movies/title', {'params': {'movie_title': 'Unknown'}})] * 3)
+
+    assert [response.status_code for response in responses] == [404] * 3
+    assert movies_collection.find_one.call_count == 1
+
+
+def test_equivalent_semantic_searches_share_one_search(app, movies_collection):
+    movies_collection.aggregate.side_effect = _slow(iter([_movie('Interstellar')]))
+
+    responses = _send_concurrently(app,
+                                   ('GET', '/movies/semantic-search', {'params': {'prompt': 'space  travel', 'limit': 1}}),
+                                   ('GET', '/movies/semantic-search', {'params': {'prompt': ' space travel', 'limit': 1}}))
+
+    assert [[movie['title'] for movie in response.json()] for response in responses] == [['Interstellar']] * 2
+    assert movies_collection.aggregate.call_count == 1
+    assert routes.movies.semantic_search_flight.get_stats() == {'executed': 1, 'coalesced': 1, 'timed_out': 0, 'in_flight': 0}
+
+
+def test_semantic_search_batch_returns_results_per_prompt(app, movies_collection):
+    movies_collection.aggregate.side_effect = lambda pipeline: iter([_movie('Interstellar')])
+
+    responses = _send_concurrently(app, ('POST', '/movies/semantic-search/batch',
+                                         {'json': {'prompts': ['space  travel', ' ocean '], 'limit': 2}}))
+
+    assert responses[0].status_code == 200
+    assert [[movie['title'] for movie in movies] for movies in responses[0].json()] == [['Interstellar']] * 2
+    assert [call.args[0][0]['$vectorSearch']['limit'] for call in movies_collection.aggregate.call_args_list] == [2, 2]
+
+
+def test_rejected_request_is_answered_with_service_unavailable(app, monkeypatch, movies_collection):
+    monkeypatch.setattr(routes.movies, 'admission_controller',
+                        RecordingAdmissionController(AdmissionRejectedError(reason='queue_full', retry_after=7)))
+
+    response = TestClient(app).get('/movies/semantic-search', params={'prompt': 'space', 'limit': 1})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    movies_collection.aggregate.assert_not_called()
+
+
+def test_request_exceeding_its_deadline_is_answered_with_service_unavailable(app, movies_collection):
+    movies_collection.aggregate.side_effect = _slow(iter([_movie('Interstellar')]), delay=0.5)
+
+    response = TestClient(app).get('/movies/semantic-search', params={'prompt': 'space', 'limit': 1},
+                                   headers={'X-Request-Timeout-Ms': '50'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_request_deadline_is_taken_from_header_or_default(app, monkeypatch, movies_collection):
+    admission_controller = RecordingAdmissionController()
+    monkeypatch.setattr(routes.movies, 'admission_controller', admission_controller)
+    movies_collection.aggregate.side_effect = lambda pipeline: iter([_movie('Interstellar')])
+    client = TestClient(app)
+
+    assert client.get('/movies/semantic-search', params={'prompt': 'space', 'limit': 1},
+                      headers={'X-Request-Timeout-Ms': '250'}).status_code == 200
+    assert client.get('/movies/semantic-search', params={'prompt': 'space', 'limit': 1}).status_code == 200
+    for invalid_timeout in ('0', '-5', 'soon'):
+        assert client.get('/movies/semantic-search', params={'prompt': 'space', 'limit': 1},
+                          headers={'X-Request-Timeout-Ms': invalid_timeout}).status_code == 422
+
+    header_timeout, default_timeout = [admission['timeout'] for admission in admission_controller.admissions]
+    assert 0 < header_timeout <= 0.25
+    assert 4 < default_timeout <= 5
+
+
+def test_requests_are_admitted_with_their_priority_class_and_cost(app, monkeypatch, movies_collection):
+    admission_controller = RecordingAdmissionController()
+    monkeypatch.setattr(routes.movies, 'admission_controller', admission_controller)
+    movies_collection.aggregate.side_effect = lambda pipeline: iter([_movie('Interstellar')])
+    client = TestClient(app)
+
+    assert client.post('/movies/', json=_movie('Avatar')).is_success
+    assert client.post('/movies/semantic-search/batch',
+                       json={'prompts': ['space', 'ocean', 'desert'], 'limit': 1}).status_code == 200
+
+    assert [(admission['priority'], admission['cost']) for admission in admission_controller.admissions] == [
+        (Priority.WRITE, 1.0), (Priority.READ, 3)]
+    movies_collection.insert_one.assert_called_once()
+
+
+def test_coalesced_search_is_retried_when_the_leader_is_rejected(app, monkeypatch, movies_collection):
+    # the leader is rejected only after the follower joined its search
+    admission_controller = RecordingAdmissionController(AdmissionRejectedError(reason='deadline', retry_after=2),
+                                                        reject_after=0.1)
+    monkeypatch.setattr(routes.movies, 'admission_controller', admission_controller)
+    movies_collection.aggregate.side_effect = lambda pipeline: iter([_movie('Interstellar')])
+
+    leader, follower = _send_concurrently(app, *[('GET', '/movies/semantic-search',
+                                                  {'params': {'prompt': 'space', 'limit': 1}})] * 2)
+
+    assert (leader.status_code, leader.headers['Retry-After']) == (503, '2')
+    assert follower.status_code == 200
+    assert [movie['title'] for movie in follower.json()] == ['Interstellar']
+    assert len(admission_controller.admissions) == 2
+    assert movies_collection.aggregate.call_count == 1
+    assert routes.movies.semantic_search_flight.get_stats()['coalesced'] == 1
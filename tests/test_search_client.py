@@ -0,0 +1,146 @@
+from pathlib import Path
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from search_client import SemanticSearchClient
+
+
+def _movie(title: str) -> dict:
+    return {'title': title, 'overview': f'{title} overview'}
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data=None) -> None:
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error', response=self)
+
+
+class FakeSession:
+    """
+    Fake API server, answers Semantic Search requests with a single movie named after the prompt
+    """
+    def __init__(self, batch_max_prompts: int = 10, known_titles: tuple = ()) -> None:
+        self.batch_max_prompts = batch_max_prompts
+        self.known_titles = known_titles
+        self.requests = []
+
+    def get(self, url: str, params: dict, timeout: float) -> FakeResponse:
+        self.requests.append(('GET', url, params))
+        if url.endswith('/movies/title'):
+            if params['movie_title'] in self.known_titles:
+                return FakeResponse(200, _movie(params['movie_title']))
+            return FakeResponse(404, {'detail': 'Movie not found'})
+        if len(params['prompt']) > 64:
+            return FakeResponse(422, {'detail': 'String should have at most 64 characters'})
+        return FakeResponse(200, [_movie(params['prompt'])])
+
+    def post(self, url: str, json: dict, timeout: float) -> FakeResponse:
+        self.requests.append(('POST', url, json))
+        if len(json['prompts']) > self.batch_max_prompts:
+            return FakeResponse(422, {'detail': 'List should have at most 10 items'})
+        if any(len(prompt) > 64 for prompt in json['prompts']):
+            return FakeResponse(422, {'detail': 'String should have at most 64 characters'})
+        return FakeResponse(200, [[_movie(prompt)] for prompt in json['prompts']])
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def session() -> FakeSession:
+    return FakeSession(known_titles=('Avatar',))
+
+
+@pytest.fixture
+def client(session: FakeSession) -> SemanticSearchClient:
+    client = SemanticSearchClient(server_url='http://127.0.0.1:8000/', cache_ttl=0.1)
+    client.session = session
+    return client
+
+
+def test_client_does_not_load_embedding_model():
+    # checked in a fresh interpreter, the test run itself imports the (stubbed) model for route tests
+    check = subprocess.run([sys.executable, '-c', 'import search_client, sys; assert "language_model" not in sys.modules'],
+                           cwd=Path(__file__).parent.parent, capture_output=True, text=True)
+
+    assert check.returncode == 0, check.stderr
+
+
+def test_semantic_search_cache_hit_and_miss(client: SemanticSearchClient, session: FakeSession):
+    first = client.semantic_search('space  adventure', limit=3)
+    # equivalent prompt is served from cache
+    second = client.semantic_search(' space adventure ', limit=3)
+    # different limit is a cache miss
+    client.semantic_search('space adventure', limit=5)
+
+    assert [movie.title for movie in first] == ['space adventure']
+    assert second == first
+    assert session.requests == [
+        ('GET', 'http://127.0.0.1:8000/movies/semantic-search', {'prompt': 'space adventure', 'limit': 3}),
+        ('GET', 'http://127.0.0.1:8000/movies/semantic-search', {'prompt': 'space adventure', 'limit': 5}),
+    ]
+
+
+def test_cached_response_expires(client: SemanticSearchClient, session: FakeSession):
+    client.semantic_search('space adventure', limit=3)
+    client.semantic_search('space adventure', limit=3)
+    time.sleep(0.15)
+    client.semantic_search('space adventure', limit=3)
+
+    assert len(session.requests) == 2
+
+
+def test_find_movie_by_title_not_found_is_empty_and_not_cached(client: SemanticSearchClient, session: FakeSession):
+    assert [movie.title for movie in client.find_movie_by_title('Avatar')] == ['Avatar']
+    assert client.find_movie_by_title('Unknown') == []
+    assert client.find_movie_by_title('Unknown') == []
+    assert client.find_movie_by_title('Avatar')[0].title == 'Avatar'
+
+    assert [params['movie_title'] for _, _, params in session.requests] == ['Avatar', 'Unknown', 'Unknown']
+
+
+def test_failed_request_raises_instead_of_returning_no_results(client: SemanticSearchClient):
+    with pytest.raises(requests.HTTPError):
+        client.semantic_search('x' * 65, limit=3)
+
+    with pytest.raises(requests.HTTPError):
+        client.semantic_search_many(['x' * 65], limit=3)
+
+
+def test_semantic_search_many_splits_batches(client: SemanticSearchClient, session: FakeSession):
+    queries = [f'query {i}' for i in range(23)]
+    client.semantic_search('query 0', limit=3)
+
+    results = client.semantic_search_many(queries + ['query  1'], limit=3)
+
+    assert [movies[0].title for movies in results] == queries + ['query 1']
+    batch_sizes = [len(body['prompts']) for method, _, body in session.requests if method == 'POST']
+    # cached and repeated queries are not requested again
+    assert batch_sizes == [10, 10, 2]
+
+    # all results are cached
+    client.semantic_search_many(queries, limit=3)
+    assert len(session.requests) == 4
+
+
+def test_async_semantic_search(client: SemanticSearchClient):
+    async def run():
+        return await asyncio.gather(client.asemantic_search('space', limit=3),
+                                    client.asemantic_search_many(['space', 'ocean'], limit=3))
+
+    single, many = asyncio.run(run())
+
+    assert single[0].title == 'space'
+    assert [movies[0].title for movies in many] == ['space', 'ocean']
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class CallerSpecificError(Exception):
+    pass
+
+
+def test_identical_concurrent_calls_are_coalesced():
+    flight = SingleFlight(name='test')
+    executions = []
+
+    async def compute(value: int) -> int:
+        executions.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*[flight.do('key', compute, 3) for _ in range(10)])
+
+    assert asyncio.run(run()) == [6] * 10
+    assert executions == [3]
+    assert flight.get_stats() == {'executed': 1, 'coalesced': 9, 'timed_out': 0, 'in_flight': 0}
+
+
+def test_different_keys_and_sequential_calls_are_executed():
+    flight = SingleFlight(name='test')
+
+    async def compute(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        results = await asyncio.gather(flight.do('a', compute, 1), flight.do('b', compute, 2))
+        # completed calls are not cached
+        results.append(await flight.do('a', compute, 1))
+        return results
+
+    assert asyncio.run(run()) == [1, 2, 1]
+    assert flight.get_stats()['executed'] == 3
+    assert flight.get_stats()['coalesced'] == 0
+
+
+def test_shared_error_is_not_modified_by_callers():
+    flight = SingleFlight(name='test')
+    shared_errors = []
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        error = ValueError('failed')
+        shared_errors.append(error)
+        raise error
+
+    async def run():
+        return await asyncio.gather(*[flight.do('key', fail) for _ in range(5)], return_exceptions=True)
+
+    errors = asyncio.run(run())
+
+    assert len(shared_errors) == 1
+    assert all(isinstance(error, ValueError) and error.args == ('failed',) for error in errors)
+    assert all(error is not shared_errors[0] and error.__cause__ is shared_errors[0] for error in errors)
+    # the original traceback only contains the frames of the failed call
+    traceback_length = 0
+    traceback = shared_errors[0].__traceback__
+    while traceback is not None:
+        traceback_length += 1
+        traceback = traceback.tb_next
+    assert traceback_length <= 2
+
+
+def test_caller_waits_only_until_its_own_timeout():
+    flight = SingleFlight(name='test')
+
+    async def compute():
+        await asyncio.sleep(0.2)
+        return 'done'
+
+    async def run():
+        patient = asyncio.ensure_future(flight.do('key', compute))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do('key', compute, timeout=0.05)
+        # the shared call is not cancelled by the timed out caller
+        return await patient
+
+    assert asyncio.run(run()) == 'done'
+    assert flight.get_stats()['timed_out'] == 1
+
+
+def test_error_of_abandoned_call_is_retrieved(caplog):
+    flight = SingleFlight(name='test')
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError('failed')
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do('key', fail, timeout=0.01)
+        # let the abandoned call fail
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+    assert 'exception was never retrieved' not in caplog.text
+    assert flight.get_stats()['in_flight'] == 0
+
+
+def test_unshared_error_is_retried_by_waiting_callers():
+    flight = SingleFlight(name='test', unshared_errors=(CallerSpecificError,))
+    executions = []
+
+    async def compute(caller: str) -> str:
+        executions.append(caller)
+        await asyncio.sleep(0.01)
+        if caller == 'leader':
+            raise CallerSpecificError()
+        return caller
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do('key', compute, 'leader'))
+        await asyncio.sleep(0)
+        followers = [flight.do('key', compute, 'follower') for _ in range(3)]
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader_result, *follower_results = asyncio.run(run())
+
+    assert isinstance(leader_result, CallerSpecificError)
+    assert follower_results == ['follower'] * 3
+    # one of the followers took over the call on behalf of the others
+    assert executions == ['leader', 'follower']
+
+
+def test_unshared_error_is_not_retried_after_caller_timeout():
+    flight = SingleFlight(name='test', unshared_errors=(CallerSpecificError,))
+    executions = []
+
+    async def compute(caller: str) -> str:
+        executions.append(caller)
+        await asyncio.sleep(0)
+        # block the event loop past the timeout of the follower, the call fails before its timeout fires
+        time.sleep(0.1)
+        raise CallerSpecificError()
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do('key', compute, 'leader'))
+        await asyncio.sleep(0)
+        follower = flight.do('key', compute, 'follower', timeout=0.05)
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(run())
+
+    assert isinstance(leader_result, CallerSpecificError)
+    assert isinstance(follower_result, asyncio.TimeoutError)
+    assert isinstance(follower_result.__cause__, CallerSpecificError)
+    assert executions == ['leader']
+    assert flight.get_stats()['timed_out'] == 1